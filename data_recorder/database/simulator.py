@@ -173,12 +173,29 @@ class Simulator(object):
     def import_csv(filename='data.xz'):
         """
         Import an historical tick file created from the
-        export_to_csv() function
+        export_to_csv() function.
+
+        The first import decompresses and parses the csv, then caches
+        the parsed arrays in a .npz file next to the source; subsequent
+        imports load the cache and skip decompression and parsing
+        entirely, which keeps multi-seed runs that instantiate many
+        environments from re-paying the csv parse per environment.
         :param filename: Full file path including filename
         :return: (panda.DataFrame) historical limit order book data
         """
         start_time = dt.now(tz=TIMEZONE)
 
+        cache = filename + '.npz'
+        if os.path.exists(cache):
+            with np.load(cache, allow_pickle=False) as cached:
+                data = pd.DataFrame(data=cached['values'],
+                                    index=cached['index'],
+                                    columns=cached['columns'])
+            elapsed = (dt.now(tz=TIMEZONE) - start_time).seconds
+            print('Imported %s from its npz cache in %i seconds' % (
+                filename[-21:], elapsed))
+            return data
+
         if 'xz' in filename:
             data = pd.read_csv(filepath_or_buffer=filename, index_col=0,
                                compression='xz', engine='c')
@@ -189,6 +206,17 @@ class Simulator(object):
             print('Error: file must be a csv or xz')
             data = None
 
+        if data is not None:
+            # write the cache to a temp file and rename it into place,
+            #   so a process killed mid-write can never leave a
+            #   truncated .npz behind that breaks every later import
+            tmp_cache = cache + '.tmp.npz'
+            np.savez(tmp_cache,
+                     values=data.values,
+                     index=data.index.values.astype(str),
+                     columns=data.columns.values.astype(str))
+            os.rename(tmp_cache, cache)
+
         elapsed = (dt.now(tz=TIMEZONE) - start_time).seconds
         print('Imported %s from a csv in %i seconds' % (filename[-21:], elapsed))
         return data
@@ -1,6 +1,39 @@
 from data_recorder.database.simulator import Simulator
 from configurations.configs import TIMEZONE
 from datetime import datetime as dt
+import numpy as np
+import pandas as pd
+import os
+import tempfile
+
+
+def test_import_csv_cache_round_trip():
+    """
+    Test case to verify the npz cache written by import_csv survives a
+    round trip and matches the csv parse
+    :return:
+    """
+    tmp_dir = tempfile.mkdtemp()
+    while 'xz' in tmp_dir:  # import_csv sniffs the full path for 'xz'
+        tmp_dir = tempfile.mkdtemp()
+    filename = os.path.join(tmp_dir, 'round_trip.csv')
+
+    data = pd.DataFrame(
+        {'coinbase_midpoint': [100.015, 100.025, 100.035],
+         'coinbase-buys': [10., 0., 5.]},
+        index=['2019-01-01 00:00:00', '2019-01-01 00:00:01',
+               '2019-01-01 00:00:02'])
+    data.to_csv(filename)
+
+    parsed = Simulator.import_csv(filename=filename)
+    assert os.path.exists(filename + '.npz')
+
+    cached = Simulator.import_csv(filename=filename)
+    assert np.allclose(parsed.values, cached.values)
+    assert list(parsed.columns) == list(cached.columns)
+    assert list(parsed.index) == list(cached.index)
+
+    print('DONE. EXITING %s' % __name__)
 
 
 def test_get_tick_history():
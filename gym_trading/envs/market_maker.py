@@ -1,8 +1,10 @@
 from gym import Env, spaces
 from data_recorder.database.simulator import Simulator as Sim
-from gym_trading.utils.mm_broker import Broker, Order
+from gym_trading.utils.mm_broker import Broker, Order, \
+    SIDE_LONG, SIDE_SHORT
 from gym_trading.utils.render_env import TradingGraph
-from configurations.configs import BROKER_FEE, INDICATOR_WINDOW, INDICATOR_WINDOW_MAX
+from configurations.configs import BROKER_FEE, INDICATOR_WINDOW, \
+    INDICATOR_WINDOW_MAX, MAX_BOOK_ROWS
 from gym_trading.indicators import RSI
 from gym_trading.indicators import TnS
 from gym_trading.indicators.indicator import IndicatorManager
@@ -31,8 +33,28 @@ class MarketMaker(Env):
     buy_trade_index = features.index('coinbase-buys')
     sell_trade_index = features.index('coinbase-sells')
 
+    # indices into the hot price projection (_hot_px) built in __init__:
+    #   the bid and ask distance ladders stay contiguous, so indexing
+    #   with `hot_best_bid_index + level` works the same as before
+    hot_best_bid_index = 0
+    hot_best_ask_index = MAX_BOOK_ROWS
+    # indices into the volume projection (_hot_vol)
+    vol_notional_bid_index = 0
+    vol_notional_ask_index = 1
+    vol_buy_trade_index = 2
+    vol_sell_trade_index = 3
+
     target_pnl = BROKER_FEE * 10 * 5  # e.g., 5 for max_positions
 
+    # lookup table mapping action id --> (long_level, short_level), where
+    #   -1 = do nothing, and -2 = flatten inventory
+    _ACTION_TABLE = np.array([[-1, -1],
+                              [0, 4], [0, 9], [0, 14],
+                              [4, 0], [4, 4], [4, 9], [4, 14],
+                              [9, 0], [9, 4], [9, 9], [9, 14],
+                              [14, 0], [14, 4], [14, 9], [14, 14],
+                              [-2, -2]], dtype=np.int8)
+
     def __init__(self, *,
                  fitting_file='ETH-USD_2018-12-31.xz',
                  testing_file='ETH-USD_2019-01-01.xz',
@@ -43,7 +65,9 @@ class MarketMaker(Env):
                  action_repeats=10,
                  training=True,
                  format_3d=False,
-                 z_score=True):
+                 z_score=True,
+                 action_as_int=False,
+                 copy_obs=True):
 
         # properties required for instantiation
         self.action_repeats = action_repeats
@@ -54,10 +78,22 @@ class MarketMaker(Env):
         self.max_position = max_position
         self.window_size = window_size
         self.format_3d = format_3d  # e.g., [window, features, *NEW_AXIS*]
+        # if True, the observation row carries the action id as a single
+        #   float instead of a 17-wide one-hot vector
+        self.action_as_int = action_as_int
+        # if True (the default), step() returns a private copy of the
+        #   observation, which is what replay memories that retain
+        #   observations (e.g. keras-rl's SequentialMemory) require.
+        #   Setting it to False hands out a reusable buffer (or the
+        #   ring itself) that is only valid until the next step() or
+        #   reset(); opt in only when observations are consumed
+        #   immediately
+        self.copy_obs = copy_obs
 
         self.action = 0
-        # derive gym.env properties
-        self.actions = np.eye(17)
+        # derive gym.env properties; float32 so the one-hot rows drop
+        # into the observation row without a dtype conversion
+        self.actions = np.eye(17, dtype=np.float32)
 
         self.sym = testing_file[:7]  # slice the CCY from the filename
 
@@ -67,27 +103,58 @@ class MarketMaker(Env):
         self.local_step_number = 0
         self.midpoint = 0.0
         self.observation = None
+        # book data rows and NBBO cached once per step iteration
+        self._step_row = None
+        self._vol_row = None
+        self._best_bid = self._best_ask = 0.0
 
         # get Broker class to keep track of PnL and orders
         self.broker = Broker(max_position=max_position)
+        # pooled Order instances reused across actions; the broker
+        #   copies their fields rather than retaining them, so the
+        #   environment never allocates an Order inside step()
+        self._pooled_bid_order = Order(ccy=self.sym, side=SIDE_LONG)
+        self._pooled_ask_order = Order(ccy=self.sym, side=SIDE_SHORT)
+        # reusable buffer for position features to avoid per-step allocations
+        self._pos_feat_buf = np.empty(
+            7 + len(self.broker.get_queues_ahead_features()), dtype=np.float32)
         # get historical data for simulations
         self.sim = Sim(use_arctic=False)
 
-        self.data = self._load_environment_data(fitting_file, testing_file)
-        self.prices_ = self.data['coinbase_midpoint'].values  # used to calculate PnL
-
-        self.normalized_data = self.data.copy()
-        self.data = self.data.values
-
-        self.max_steps = self.data.shape[0] - self.step_size * \
+        data = self._load_environment_data(fitting_file, testing_file)
+        # used to calculate PnL; kept in float64 so the integer-tick
+        #   price arithmetic stays exact at 4- and 5-figure midpoints
+        self.prices_ = np.ascontiguousarray(
+            data['coinbase_midpoint'].values, dtype=np.float64)
+        # project the handful of raw columns read by the order logic
+        #   into two small contiguous matrices, so each step's book
+        #   reads touch a few cache lines instead of a full feature
+        #   row. The distance ladders feed the integer-tick price
+        #   arithmetic and sit on exact half-ticks, so they stay in
+        #   float64; the notional and trade-volume columns never enter
+        #   the tick math and can afford float32
+        px_columns = (list(range(MarketMaker.best_bid_index,
+                                 MarketMaker.best_bid_index + MAX_BOOK_ROWS)) +
+                      list(range(MarketMaker.best_ask_index,
+                                 MarketMaker.best_ask_index + MAX_BOOK_ROWS)))
+        vol_columns = [MarketMaker.notional_bid_index,
+                       MarketMaker.notional_ask_index,
+                       MarketMaker.buy_trade_index,
+                       MarketMaker.sell_trade_index]
+        self._hot_px = np.ascontiguousarray(
+            data.values[:, px_columns], dtype=np.float64)
+        self._hot_vol = np.ascontiguousarray(
+            data.values[:, vol_columns], dtype=np.float32)
+
+        self.max_steps = self._hot_px.shape[0] - self.step_size * \
                          self.action_repeats - 1
 
-        # normalize midpoint data
-        self.normalized_data['coinbase_midpoint'] = \
-            np.log(self.normalized_data['coinbase_midpoint'].values)
-        self.normalized_data['coinbase_midpoint'] = (
-                self.normalized_data['coinbase_midpoint'] -
-                self.normalized_data['coinbase_midpoint'].shift(1)).fillna(0.)
+        # normalize midpoint data with a single vectorized log-diff
+        #   (first step has no prior price and becomes 0.); the raw
+        #   values were copied out above, so the frame is transformed
+        #   in place rather than duplicated wholesale
+        data['coinbase_midpoint'] = np.concatenate(
+            ([0.], np.diff(np.log(self.prices_))))
 
         # load indicators into the indicator manager
         self.tns = IndicatorManager()
@@ -98,19 +165,50 @@ class MarketMaker(Env):
 
         if z_score:
             logger.info("Pre-scaling {}-{} data...".format(self.sym, self._seed))
-            self.normalized_data = self.normalized_data.apply(
-                self.sim.z_score, axis=1).values
+            self.normalized_data = np.ascontiguousarray(
+                self.sim.scale_state(data).values, dtype=np.float32)
             logger.info("...{}-{} pre-scaling complete.".format(self.sym, self._seed))
         else:
-            self.normalized_data = self.normalized_data.values
+            self.normalized_data = np.ascontiguousarray(
+                data.values, dtype=np.float32)
+        del data
+
+        # clip once here, rather than clipping every row in the step loop
+        np.clip(self.normalized_data, -10., 10., out=self.normalized_data)
 
         # rendering class
         self._render = TradingGraph(sym=self.sym)
         # graph midpoint prices
         self._render.reset_render_data(
             y_vec=self.prices_[:np.shape(self._render.x_vec)[0]])
-        # buffer for appending lags
-        self.data_buffer = list()
+        # slice layout of a single observation row:
+        #   normalized data | tns | rsi | position | action | reward
+        n_norm = self.normalized_data.shape[1]
+        n_ind = len(INDICATOR_WINDOW)
+        n_pos = self._pos_feat_buf.shape[0]
+        n_act = 1 if self.action_as_int else len(self.actions)
+        self._norm_slice = slice(0, n_norm)
+        self._tns_slice = slice(n_norm, n_norm + n_ind)
+        self._rsi_slice = slice(n_norm + n_ind, n_norm + 2 * n_ind)
+        self._pos_slice = slice(n_norm + 2 * n_ind, n_norm + 2 * n_ind + n_pos)
+        self._act_slice = slice(n_norm + 2 * n_ind + n_pos,
+                                n_norm + 2 * n_ind + n_pos + n_act)
+        obs_dim = n_norm + 2 * n_ind + n_pos + n_act + 1
+        # the leading normalized + indicator columns depend only on the
+        #   time step, so they are precomputed per-episode in reset()
+        self._static_end = n_norm + 2 * n_ind
+        self._static_obs = None
+        self._episode_start = 0
+
+        # reusable observation row; position features are written into
+        #   their slice of the row directly
+        self._obs_row = np.empty(obs_dim, dtype=np.float32)
+        self._pos_feat_buf = self._obs_row[self._pos_slice]
+        # ring buffer for appending lags, and a reusable output buffer
+        #   for un-rolling it into chronological order
+        self._ring = np.empty((self.window_size, obs_dim), dtype=np.float32)
+        self._ring_head = 0
+        self._obs_out = np.empty_like(self._ring)
 
         self.action_space = spaces.Discrete(len(self.actions))
         self.reset()  # reset to load observation.shape
@@ -139,16 +237,16 @@ class MarketMaker(Env):
             else:
                 step_action = 0
 
-            # Get current step's midpoint
+            # Get current step's midpoint and book data row
             self.midpoint = self.prices_[self.local_step_number]
+            self._step_row = self._hot_px[self.local_step_number]
+            self._vol_row = self._hot_vol[self.local_step_number]
             # Pass current time step midpoint to broker to calculate PnL,
             # or if any open orders are to be filled
-            step_best_bid, step_best_ask = self._get_nbbo()
-            buy_volume = self._get_book_data(MarketMaker.buy_trade_index)
-            sell_volume = self._get_book_data(MarketMaker.sell_trade_index)
-
-            self.tns.step(buys=buy_volume, sells=sell_volume)
-            self.rsi.step(price=self.midpoint)
+            self._best_bid, self._best_ask = self._get_nbbo()
+            step_best_bid, step_best_ask = self._best_bid, self._best_ask
+            buy_volume = self._vol_row[MarketMaker.vol_buy_trade_index]
+            sell_volume = self._vol_row[MarketMaker.vol_sell_trade_index]
 
             step_reward = self.broker.step(
                 bid_price=step_best_bid,
@@ -161,10 +259,7 @@ class MarketMaker(Env):
             self.reward += step_reward
 
             step_observation = self._get_step_observation(action=action)
-            self.data_buffer.append(step_observation)
-
-            if len(self.data_buffer) > self.window_size:
-                del self.data_buffer[0]
+            self._add_to_buffer(step_observation)
 
             self.local_step_number += self.step_size
 
@@ -172,6 +267,7 @@ class MarketMaker(Env):
 
         if self.local_step_number > self.max_steps:
             self.done = True
+            self._step_row = self._hot_px[self.local_step_number]
             self.reward += self.broker.flatten_inventory(*self._get_nbbo())
 
         return self.observation, self.reward, self.done, {}
@@ -180,7 +276,7 @@ class MarketMaker(Env):
         if self.training:
             self.local_step_number = self._random_state.randint(
                 low=1,
-                high=self.data.shape[0] // 4)
+                high=self._hot_px.shape[0] // 4)
         else:
             self.local_step_number = 0
 
@@ -194,24 +290,50 @@ class MarketMaker(Env):
         self.reward = 0.0
         self.done = False
         self.broker.reset()
-        self.data_buffer.clear()
+        self._ring_head = 0
         self.rsi.reset()
         self.tns.reset()
 
-        for step in range(self.window_size + INDICATOR_WINDOW_MAX):
-            self.midpoint = self.prices_[self.local_step_number]
-
-            step_buy_volume = self._get_book_data(MarketMaker.buy_trade_index)
-            step_sell_volume = self._get_book_data(MarketMaker.sell_trade_index)
-            self.tns.step(buys=step_buy_volume, sells=step_sell_volume)
-            self.rsi.step(price=self.midpoint)
-
-            step_observation = self._get_step_observation(action=0)
-            self.data_buffer.append(step_observation)
+        # run the indicators over the episode's entire range in one
+        #   compiled batch, rather than stepping through a Python loop;
+        #   the normalized + indicator columns depend only on the time
+        #   step, so the static part of every observation row this
+        #   episode can be assembled here with slice assignments
+        warmup_steps = self.window_size + INDICATOR_WINDOW_MAX
+        indices = np.arange(self.local_step_number,
+                            self._hot_px.shape[0], self.step_size)
+        warmup_prices = self.prices_[indices]
+        tns_values = self.tns.warmup(
+            buys=self._hot_vol[indices, MarketMaker.vol_buy_trade_index],
+            sells=self._hot_vol[indices, MarketMaker.vol_sell_trade_index])
+        rsi_values = self.rsi.warmup(prices=warmup_prices)
+
+        static = np.empty((indices.shape[0], self._static_end),
+                          dtype=np.float32)
+        static[:, self._norm_slice] = self.normalized_data[indices]
+        static[:, self._tns_slice] = tns_values
+        static[:, self._rsi_slice] = rsi_values
+        self._static_obs = static
+        self._episode_start = self.local_step_number
+
+        # blast the last window_size warmup rows into the ring buffer;
+        #   the broker is flat after reset, so the position features are
+        #   all zero, the action is 0, and there is no reward
+        tail = warmup_steps - self.window_size
+        ring = self._ring
+        ring[:, :self._static_end] = static[tail:warmup_steps]
+        ring[:, self._pos_slice] = 0.
+        if self.action_as_int:
+            ring[:, self._act_slice] = 0.
+        else:
+            ring[:, self._act_slice] = self.actions[0]
+        ring[:, -1] = 0.
+        self._ring_head = 0
 
-            self.local_step_number += self.step_size
-            if len(self.data_buffer) > self.window_size:
-                del self.data_buffer[0]
+        self.midpoint = warmup_prices[warmup_steps - 1]
+        self._step_row = self._hot_px[indices[warmup_steps - 1]]
+        self._vol_row = self._hot_vol[indices[warmup_steps - 1]]
+        self.local_step_number += warmup_steps * self.step_size
 
         self.observation = self._get_observation()
 
@@ -222,12 +344,14 @@ class MarketMaker(Env):
 
     def close(self):
         logger.info('{}-{} is being closed.'.format(self.id, self.sym))
-        self.data = None
+        self._hot_px = None
+        self._hot_vol = None
         self.normalized_data = None
         self.prices_ = None
         self.broker = None
         self.sim = None
-        self.data_buffer = None
+        self._ring = None
+        self._static_obs = None
         self.tns = None
         self.rsi = None
         return
@@ -238,212 +362,140 @@ class MarketMaker(Env):
         logger.info('Setting seed in MarketMaker.seed({})'.format(seed))
         return [seed]
 
-    @staticmethod
-    def _process_data(_next_state):
-        return np.clip(_next_state.reshape((1, -1)), -10., 10.)
-
-    # def _process_data(self, _next_state):
-    #     # return self.sim.scale_state(_next_state).values.reshape((1, -1))
-    #     return np.reshape(_next_state, (1, -1))
-
     def _send_to_broker_and_get_reward(self, action):
         reward = 0.0
         discouragement = 0.000000000001
 
-        if action == 0:  # do nothing
-            reward += discouragement
+        if not 0 <= action <= 16:
+            logger.info("L'action n'exist pas ! Il faut faire attention !")
+            return reward
 
-        elif action == 1:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=0, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=4, side='short')
-
-        elif action == 2:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=0, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=9, side='short')
-        elif action == 3:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=0, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=14, side='short')
-
-        elif action == 4:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=4, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=0, side='short')
-
-        elif action == 5:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=4, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=4, side='short')
-
-        elif action == 6:
-
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=4, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=9, side='short')
-        elif action == 7:
-
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=4, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=14, side='short')
-
-        elif action == 8:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=9, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=0, side='short')
-
-        elif action == 9:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=9, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=4, side='short')
-
-        elif action == 10:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=9, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=9, side='short')
-
-        elif action == 11:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=9, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=14, side='short')
-
-        elif action == 12:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=14, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=0, side='short')
-
-        elif action == 13:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=14, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=4, side='short')
-
-        elif action == 14:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=14, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=9, side='short')
-
-        elif action == 15:
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=14, side='long')
-            reward += self._create_order_at_level(reward, discouragement,
-                                                  level=14, side='short')
-        elif action == 16:
-            reward += self.broker.flatten_inventory(*self._get_nbbo())
+        level_long, level_short = MarketMaker._ACTION_TABLE[action]
+
+        if level_long == -1:  # do nothing
+            reward += discouragement
+        elif level_long == -2:  # flatten inventory
+            reward += self.broker.flatten_inventory(self._best_bid,
+                                                    self._best_ask)
         else:
-            logger.info("L'action n'exist pas ! Il faut faire attention !")
+            reward += self._create_long_order(level=level_long,
+                                              discouragement=discouragement)
+            reward += self._create_short_order(level=level_short,
+                                               discouragement=discouragement)
 
         return reward
 
     def _create_position_features(self):
-        return np.array(
-            (self.broker.long_inventory.position_count / self.max_position,
-             self.broker.short_inventory.position_count / self.max_position,
-             self.broker.get_total_pnl(midpoint=self.midpoint) /
-             MarketMaker.target_pnl,
-             self.broker.long_inventory.get_unrealized_pnl(self.midpoint) /
-             self.broker.reward_scale,
-             self.broker.short_inventory.get_unrealized_pnl(self.midpoint) /
-             self.broker.reward_scale,
-             self.broker.get_long_order_distance_to_midpoint(midpoint=self.midpoint),
-             self.broker.get_short_order_distance_to_midpoint(midpoint=self.midpoint),
-             *self.broker.get_queues_ahead_features()),
-            dtype=np.float32)
+        buf = self._pos_feat_buf
+        (long_count, short_count, total_pnl, long_upnl, short_upnl,
+         long_distance, short_distance) = self.broker.snapshot(
+            midpoint=self.midpoint)
+        buf[0] = long_count / self.max_position
+        buf[1] = short_count / self.max_position
+        buf[2] = total_pnl / MarketMaker.target_pnl
+        buf[3] = long_upnl / self.broker.reward_scale
+        buf[4] = short_upnl / self.broker.reward_scale
+        buf[5] = long_distance
+        buf[6] = short_distance
+        buf[7:] = self.broker.get_queues_ahead_features()
+        return buf
 
     def _create_action_features(self, action):
         return self.actions[action]
 
-    def _create_indicator_features(self):
-        return np.array((*self.tns.get_value(), *self.rsi.get_value()),
-                        dtype=np.float32)
-
-    def _create_order_at_level(self, reward, discouragement, level=0, side='long'):
+    def _create_long_order(self, level=0, discouragement=0.):
         adjustment = 1 if level > 0 else 0
 
-        if side == 'long':
-            best_bid = self._get_book_data(MarketMaker.best_bid_index + level)
-            above_best_bid = round(self._get_book_data(
-                MarketMaker.best_bid_index + level - adjustment), 2)
-            price_improvement_bid = round(best_bid + 0.01, 2)
+        best_bid = self._get_book_data(MarketMaker.hot_best_bid_index + level)
+        # work in integer ticks (1 tick = $0.01) to avoid round() calls
+        #   and float equality comparisons on the order-submission path
+        above_best_bid_ticks = int(self._get_book_data(
+            MarketMaker.hot_best_bid_index + level - adjustment) * 100. + 0.5)
+        price_improvement_bid_ticks = int(best_bid * 100. + 0.5) + 1
 
-            if above_best_bid == price_improvement_bid:
-                bid_price = round(self.midpoint - best_bid, 2)
-                bid_queue_ahead = self._get_book_data(MarketMaker.notional_bid_index)
-            else:
-                bid_price = round(self.midpoint - price_improvement_bid, 2)
-                bid_queue_ahead = 0.
+        if above_best_bid_ticks == price_improvement_bid_ticks:
+            bid_price = int((self.midpoint - best_bid) * 100. + 0.5) * 0.01
+            bid_queue_ahead = self._vol_row[MarketMaker.vol_notional_bid_index]
+        else:
+            bid_price = int((self.midpoint -
+                             price_improvement_bid_ticks * 0.01) *
+                            100. + 0.5) * 0.01
+            bid_queue_ahead = 0.
 
-            bid_order = Order(ccy=self.sym, side='long', price=bid_price,
-                              step=self.local_step_number,
-                              queue_ahead=bid_queue_ahead)
+        bid_order = self._pooled_bid_order
+        bid_order.reset(price=bid_price, step=self.local_step_number,
+                        queue_ahead=bid_queue_ahead)
 
-            if self.broker.add(order=bid_order) is False:
-                reward -= discouragement
-            else:
-                reward += discouragement
+        if self.broker.add(order=bid_order) is False:
+            return -discouragement
+        return discouragement
 
-        if side == 'short':
-            best_ask = self._get_book_data(MarketMaker.best_bid_index + level)
-            above_best_ask = round(self._get_book_data(
-                MarketMaker.best_ask_index + level - adjustment), 2)
-            price_improvement_ask = round(best_ask - 0.01, 2)
+    def _create_short_order(self, level=0, discouragement=0.):
+        adjustment = 1 if level > 0 else 0
 
-            if above_best_ask == price_improvement_ask:
-                ask_price = round(self.midpoint + best_ask, 2)
-                ask_queue_ahead = self._get_book_data(MarketMaker.notional_ask_index)
-            else:
-                ask_price = round(self.midpoint + price_improvement_ask, 2)
-                ask_queue_ahead = 0.
+        best_ask = self._get_book_data(MarketMaker.hot_best_bid_index + level)
+        above_best_ask_ticks = int(self._get_book_data(
+            MarketMaker.hot_best_ask_index + level - adjustment) * 100. + 0.5)
+        price_improvement_ask_ticks = int(best_ask * 100. + 0.5) - 1
 
-            ask_order = Order(ccy=self.sym, side='short', price=ask_price,
-                              step=self.local_step_number,
-                              queue_ahead=ask_queue_ahead)
+        if above_best_ask_ticks == price_improvement_ask_ticks:
+            ask_price = int((self.midpoint + best_ask) * 100. + 0.5) * 0.01
+            ask_queue_ahead = self._vol_row[MarketMaker.vol_notional_ask_index]
+        else:
+            ask_price = int((self.midpoint +
+                             price_improvement_ask_ticks * 0.01) *
+                            100. + 0.5) * 0.01
+            ask_queue_ahead = 0.
 
-            if self.broker.add(order=ask_order) is False:
-                reward -= discouragement
-            else:
-                reward += discouragement
+        ask_order = self._pooled_ask_order
+        ask_order.reset(price=ask_price, step=self.local_step_number,
+                        queue_ahead=ask_queue_ahead)
 
-        return reward
+        if self.broker.add(order=ask_order) is False:
+            return -discouragement
+        return discouragement
 
     def _get_nbbo(self):
-        best_bid = round(self.midpoint - self._get_book_data(
-            MarketMaker.best_bid_index), 2)
-        best_ask = round(self.midpoint + self._get_book_data(
-            MarketMaker.best_ask_index), 2)
+        best_bid = int((self.midpoint - self._get_book_data(
+            MarketMaker.hot_best_bid_index)) * 100. + 0.5) * 0.01
+        best_ask = int((self.midpoint + self._get_book_data(
+            MarketMaker.hot_best_ask_index)) * 100. + 0.5) * 0.01
         return best_bid, best_ask
 
     def _get_book_data(self, index=0):
-        return self.data[self.local_step_number][index]
+        return self._step_row[index]
 
     def _get_step_observation(self, action=0):
-        step_position_features = self._create_position_features()
-        step_action_features = self._create_action_features(action=action)
-        step_indicator_features = self._create_indicator_features()
-        return np.concatenate(
-            (self._process_data(self.normalized_data[self.local_step_number]),
-             step_indicator_features,
-             step_position_features,
-             step_action_features,
-             np.array([self.reward])),
-            axis=None)
+        row = self._obs_row
+        row[:self._static_end] = self._static_obs[
+            (self.local_step_number - self._episode_start) // self.step_size]
+        self._create_position_features()  # writes into the row's slice
+        if self.action_as_int:
+            row[self._act_slice] = action
+        else:
+            row[self._act_slice] = self._create_action_features(action=action)
+        row[-1] = self.reward
+        return row
+
+    def _add_to_buffer(self, step_observation):
+        self._ring[self._ring_head] = step_observation
+        self._ring_head = (self._ring_head + 1) % self.window_size
 
     def _get_observation(self):
-        observation = np.array(self.data_buffer, dtype=np.float32)
+        head = self._ring_head
+        if head == 0:
+            # the ring is already in chronological order — hand it out
+            observation = self._ring
+        else:
+            # un-roll the ring buffer into chronological order with
+            #   two contiguous-slice copies into the reusable buffer
+            out = self._obs_out
+            split = self.window_size - head
+            out[:split] = self._ring[head:]
+            out[split:] = self._ring[:head]
+            observation = out
+        if self.copy_obs:
+            observation = observation.copy()
         # Expand the observation space from 2 to 3 dimensions.
         # This is necessary for conv nets in Baselines.
         if self.format_3d:
@@ -456,11 +508,11 @@ class MarketMaker(Env):
         data_used_in_environment = '{}/data_exports/{}'.format(self.sim.cwd,
                                                                testing_file)
         fitting_data = self.sim.import_csv(filename=fitting_data_filepath)
-        fitting_data['coinbase_midpoint'] = np.log(fitting_data['coinbase_midpoint'].
-                                                   values)
-        fitting_data['coinbase_midpoint'] = (
-                fitting_data['coinbase_midpoint'] -
-                fitting_data['coinbase_midpoint'].shift(1)).fillna(method='bfill')
+        # vectorized log-diff; the first step backfills with the next value
+        log_prices = np.log(fitting_data['coinbase_midpoint'].values)
+        log_diffs = np.diff(log_prices)
+        fitting_data['coinbase_midpoint'] = np.concatenate(
+            (log_diffs[:1], log_diffs))
         self.sim.fit_scaler(fitting_data)
         del fitting_data
         return self.sim.import_csv(filename=data_used_in_environment)
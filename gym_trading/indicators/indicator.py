@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from configurations.configs import INDICATOR_WINDOW
-from collections import deque
+import numpy as np
 
 
 class Indicator(ABC):
@@ -11,11 +11,9 @@ class Indicator(ABC):
         :param window: (int) rolling window used for indicators
         """
         self.window = window
-        self.all_history_queue = deque(maxlen=self.window)
 
     def __str__(self):
-        return 'Indicator.base() [window={}, all_history_queue={}]'.format(
-            self.window, self.all_history_queue)
+        return 'Indicator.base() [window={}]'.format(self.window)
 
     @abstractmethod
     def reset(self):
@@ -90,6 +88,17 @@ class IndicatorManager(object):
         for (name, indicator) in self.indicators:
             getattr(indicator, 'step')(**kwargs)
 
+    def warmup(self, **kwargs):
+        """
+        Update all indicators with arrays of historical steps in a
+        single batch per indicator
+        :param kwargs: arrays passed to each indicator's warmup()
+        :return: (ndarray) per-step indicator values, one column
+                per indicator
+        """
+        return np.column_stack([getattr(indicator, 'warmup')(**kwargs)
+                                for (name, indicator) in self.indicators])
+
     def reset(self):
         """
         Reset all indicators being managed
@@ -1,12 +1,17 @@
 import numpy as np
 from configurations.configs import INDICATOR_WINDOW
 from gym_trading.indicators.indicator import Indicator
+from gym_trading.utils._jit_kernels import rsi_step, rsi_value, rsi_warmup
 
 
 class RSI(Indicator):
 
     def __init__(self, window=INDICATOR_WINDOW):
         super(RSI, self).__init__(window=window)
+        self._warmup = rsi_warmup(self.window)
+        self._buf = np.zeros(self.window, dtype=np.float64)
+        self._head = 0
+        self._count = 0
         self.last_price = np.nan
         self.ups = 0.
         self.downs = 0.
@@ -16,7 +21,8 @@ class RSI(Indicator):
                    self.last_price, self.ups, self.downs)
 
     def reset(self):
-        self.all_history_queue.clear()
+        self._head = 0
+        self._count = 0
         self.last_price = np.nan
         self.ups = 0.
         self.downs = 0.
@@ -30,40 +36,24 @@ class RSI(Indicator):
             print('Error: RSI.step() -> price is {}'.format(price))
             return
 
-        if price == 0.:
-            price_pct_change = 0.
-        elif self.last_price == 0.:
-            price_pct_change = 0.
-        else:
-            price_pct_change = round((price - self.last_price) / self.last_price, 6)
-
-        if np.isinf(price_pct_change):
-            price_pct_change = 0.
-
+        self.ups, self.downs, self._head, self._count = rsi_step(
+            self._buf, self._head, self._count, self.window,
+            self.ups, self.downs, self.last_price, price)
         self.last_price = price
 
-        if price_pct_change > 0.:
-            self.ups += price_pct_change
-        elif price_pct_change < 0.:
-            self.downs += price_pct_change
-
-        self.all_history_queue.append(price_pct_change)
-
-        if len(self.all_history_queue) >= self.window:
-            price_to_remove = self.all_history_queue.popleft()
-
-            if price_to_remove > 0.:
-                self.ups -= price_to_remove
-            elif price_to_remove < 0.:
-                self.downs -= price_to_remove
+    def warmup(self, prices):
+        """
+        Step through an array of prices in one compiled batch
+        :param prices: (ndarray) prices, in chronological order
+        :return: (ndarray) indicator value after each step
+        """
+        prices = np.ascontiguousarray(prices, dtype=np.float64)
+        values = np.empty(prices.shape[0], dtype=np.float64)
+        (self.ups, self.downs, self._head, self._count,
+         self.last_price) = self._warmup(
+            self._buf, self._head, self._count,
+            self.ups, self.downs, self.last_price, prices, values)
+        return values
 
     def get_value(self):
-        abs_downs = abs(self.downs)
-        nom = self.ups - abs_downs
-        denom = self.ups + abs_downs
-        if denom == 0.:
-            return 0.
-        elif nom == 0.:
-            return 0.
-        else:
-            return nom / denom
+        return rsi_value(self.ups, self.downs)
@@ -1,12 +1,17 @@
-from collections import deque
+import numpy as np
 from configurations.configs import INDICATOR_WINDOW
 from gym_trading.indicators.indicator import Indicator
+from gym_trading.utils._jit_kernels import tns_step, tns_value, tns_warmup
 
 
 class TnS(Indicator):
 
     def __init__(self, window=INDICATOR_WINDOW):
         super(TnS, self).__init__(window=window)
+        self._warmup = tns_warmup(self.window)
+        self._buf = np.zeros((self.window, 2), dtype=np.float64)
+        self._head = 0
+        self._count = 0
         self.ups = 0.
         self.downs = 0.
 
@@ -14,25 +19,30 @@ class TnS(Indicator):
         return "TNS: ups={} | downs={}".format(self.ups, self.downs)
 
     def reset(self):
-        self.all_history_queue.clear()
+        self._head = 0
+        self._count = 0
         self.ups = 0.
         self.downs = 0.
 
     def step(self, buys=0., sells=0.):
-        self.ups += buys
-        self.downs += sells
-        self.all_history_queue.append((buys, sells))
-
-        if len(self.all_history_queue) >= self.window:
-            buys_, sells_ = self.all_history_queue.popleft()
-            self.ups -= buys_
-            self.downs -= sells_
+        self.ups, self.downs, self._head, self._count = tns_step(
+            self._buf, self._head, self._count, self.window,
+            self.ups, self.downs, buys, sells)
+
+    def warmup(self, buys, sells):
+        """
+        Step through arrays of buy/sell volumes in one compiled batch
+        :param buys: (ndarray) buy volumes, in chronological order
+        :param sells: (ndarray) sell volumes, in chronological order
+        :return: (ndarray) indicator value after each step
+        """
+        buys = np.ascontiguousarray(buys, dtype=np.float64)
+        sells = np.ascontiguousarray(sells, dtype=np.float64)
+        values = np.empty(buys.shape[0], dtype=np.float64)
+        self.ups, self.downs, self._head, self._count = self._warmup(
+            self._buf, self._head, self._count,
+            self.ups, self.downs, buys, sells, values)
+        return values
 
     def get_value(self):
-        nom = round(self.ups - self.downs, 6)
-        denom = round(self.ups + self.downs, 6)
-
-        if denom == 0.:
-            return 0.
-        else:
-            return nom / denom
+        return tns_value(self.ups, self.downs)
@@ -53,6 +53,47 @@ class MyTestCase(unittest.TestCase):
                          msg='indicator_value is {} and should be {}'.format(
                              indicator_value, float(-1)))
 
+    def test_rsi_warmup_matches_step(self):
+        indicator_a = RSI(window=5)
+        indicator_b = RSI(window=5)
+        prices = np.array([100., 100.5, 100.2, 101., 100.8,
+                           100.8, 101.3, 100.9, 101.5, 101.1])
+        warmup_values = indicator_a.warmup(prices=prices)
+        for i, price in enumerate(prices):
+            indicator_b.step(price=price)
+            self.assertAlmostEqual(
+                warmup_values[i], indicator_b.get_value(),
+                msg='warmup and step diverge at index {}'.format(i))
+
+    def test_tns_warmup_matches_step(self):
+        indicator_a = TnS(window=5)
+        indicator_b = TnS(window=5)
+        buys = np.array([10., 0., 5., 0., 20., 0., 0., 15., 0., 5.])
+        sells = np.array([0., 5., 0., 10., 0., 0., 25., 0., 5., 0.])
+        warmup_values = indicator_a.warmup(buys=buys, sells=sells)
+        for i, (buy, sell) in enumerate(zip(buys, sells)):
+            indicator_b.step(buys=buy, sells=sell)
+            self.assertAlmostEqual(
+                warmup_values[i], indicator_b.get_value(),
+                msg='warmup and step diverge at index {}'.format(i))
+
+    def test_reset_clears_state(self):
+        rsi = RSI(window=5)
+        tns = TnS(window=5)
+        rsi.warmup(prices=np.array([100., 101., 100.5, 102., 101.5]))
+        tns.warmup(buys=np.array([10., 0., 5.]),
+                   sells=np.array([0., 5., 0.]))
+        rsi.reset()
+        tns.reset()
+        self.assertEqual(0., rsi.get_value())
+        self.assertEqual(0., tns.get_value())
+        # a reset indicator must track a fresh one exactly
+        fresh = RSI(window=5)
+        for price in [100., 99., 99.5, 100.5]:
+            rsi.step(price=price)
+            fresh.step(price=price)
+            self.assertEqual(fresh.get_value(), rsi.get_value())
+
     def test_indicator_manager(self):
         im = IndicatorManager()
         for i in range(2, 5):
@@ -0,0 +1,117 @@
+import unittest
+from configurations.configs import BROKER_FEE
+from gym_trading.utils.mm_broker import Broker, Order, PositionI, \
+    SIDE_LONG, SIDE_SHORT
+
+
+def fill_position(inventory, price):
+    """
+    Open an order at `price` with nothing queued ahead and trade enough
+    volume through it to fill the full order size.
+    """
+    inventory.add_order(Order(ccy='BTC-USD', side=inventory.side,
+                              price=price, step=1, queue_ahead=0.))
+    inventory.step(bid_price=price - 1., ask_price=price + 1.,
+                   buy_volume=Order._size, sell_volume=Order._size, step=2)
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_fill_and_net_out(self):
+        print('\nTest_Fill_And_Net_Out')
+
+        test_position = Broker(max_position=2)
+
+        test_position.add(order=Order(ccy='BTC-USD', side=SIDE_LONG,
+                                      price=100., step=1, queue_ahead=0.))
+        reward = test_position.step(bid_price=99., ask_price=101.,
+                                    buy_volume=Order._size,
+                                    sell_volume=0., step=2)
+        self.assertEqual(0., reward)
+        self.assertEqual(1, test_position.long_inventory.position_count)
+        self.assertIsNone(test_position.long_inventory.order)
+
+        test_position.add(order=Order(ccy='BTC-USD', side=SIDE_SHORT,
+                                      price=101., step=3, queue_ahead=0.))
+        reward = test_position.step(bid_price=99., ask_price=102.,
+                                    buy_volume=0.,
+                                    sell_volume=Order._size, step=4)
+
+        # the short fill at 101. nets against the long entry at 100.
+        self.assertEqual(0, test_position.long_inventory.position_count)
+        self.assertEqual(0, test_position.short_inventory.position_count)
+        self.assertAlmostEqual((101. - 100.) / 100.,
+                               reward * Broker.reward_scale)
+        self.assertAlmostEqual((101. - 100.) / 100.,
+                               test_position.get_realized_pnl())
+
+    def test_fifo_remove_and_lifo_pop(self):
+        print('\nTest_FIFO_Remove_And_LIFO_Pop')
+
+        inventory = PositionI(side=SIDE_LONG, max_position=3)
+        for price in [100., 101., 102.]:
+            fill_position(inventory, price=price)
+        self.assertEqual(3, inventory.position_count)
+
+        # pop_position removes the newest entry (LIFO)
+        self.assertEqual(102., inventory.pop_position())
+        self.assertEqual(2, inventory.position_count)
+
+        # remove_position closes the oldest entry (FIFO)
+        pnl = inventory.remove_position(midpoint=103.)
+        self.assertAlmostEqual((103. - 100.) / 100., pnl)
+        self.assertEqual(1, inventory.position_count)
+
+        pnl = inventory.remove_position(midpoint=101.)
+        self.assertAlmostEqual(0., pnl)
+        self.assertEqual(0, inventory.position_count)
+        self.assertAlmostEqual(0., inventory.average_price)
+
+    def test_flatten_matches_sequential_close(self):
+        print('\nTest_Flatten_Matches_Sequential_Close')
+
+        flattened = PositionI(side=SIDE_SHORT, max_position=3)
+        sequential = PositionI(side=SIDE_SHORT, max_position=3)
+        for price in [100., 101., 102.]:
+            fill_position(flattened, price=price)
+            fill_position(sequential, price=price)
+
+        midpoint = 99.5
+        delta = flattened.flatten_inventory(midpoint=midpoint)
+        expected = sum(sequential.remove_position(midpoint=midpoint)
+                       for _ in range(3)) - 3 * BROKER_FEE
+
+        self.assertAlmostEqual(expected, delta)
+        self.assertAlmostEqual(delta, flattened.realized_pnl)
+        self.assertEqual(0, flattened.position_count)
+        self.assertEqual(sequential.total_trade_count,
+                         flattened.total_trade_count)
+        self.assertAlmostEqual(0., flattened.average_price)
+        self.assertAlmostEqual(0., flattened.total_exposure)
+
+    def test_average_price_after_partial_fill_and_update(self):
+        print('\nTest_Average_Price_After_Partial_Fill_And_Update')
+
+        inventory = PositionI(side=SIDE_LONG, max_position=1)
+        inventory.add_order(Order(ccy='BTC-USD', side=SIDE_LONG,
+                                  price=100., step=1, queue_ahead=0.))
+        inventory.step(bid_price=99., ask_price=101.,
+                       buy_volume=600., sell_volume=0., step=2)
+        self.assertEqual(600., inventory.order.executed)
+
+        # a price update keeps the partially-executed volume
+        inventory.add_order(Order(ccy='BTC-USD', side=SIDE_LONG,
+                                  price=99.5, step=3, queue_ahead=0.))
+        self.assertEqual(600., inventory.order.executed)
+        self.assertEqual(99.5, inventory.order.price)
+
+        inventory.step(bid_price=99., ask_price=101.,
+                       buy_volume=400., sell_volume=0., step=4)
+        self.assertIsNone(inventory.order)
+        self.assertEqual(1, inventory.position_count)
+        # 600 @ 100. plus 400 @ 99.5 = 99.8 average
+        self.assertAlmostEqual(99.8, inventory.average_price, places=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
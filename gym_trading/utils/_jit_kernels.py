@@ -0,0 +1,279 @@
+"""
+Compiled kernels for the gym environments, consolidated into one module
+so they share a single on-disk compilation cache.
+
+Each kernel is declared with an explicit signature so Numba compiles it
+eagerly at import time and, with cache=True, serializes the compiled
+artifact next to this file. After the first import on a machine, every
+subsequent process loads the machine code from the cache instead of
+re-running the JIT, which keeps short-lived evaluation environments
+from paying the compilation cost on every instantiation.
+"""
+import numpy as np
+from gym_trading.utils.jit import njit
+
+# kernels specialized per window size, keyed by (indicator, window)
+_specialized_warmups = {}
+
+
+@njit('Tuple((f8, f8, i8, i8))(f8[:, :], i8, i8, i8, f8, f8, f8, f8)',
+      cache=True)
+def tns_step(buf, head, count, window, ups, downs, buys, sells):
+    """
+    Compiled per-tick update for TnS using a circular buffer of
+    (buys, sells) pairs; the running sums make each update O(1)
+    :param buf: (ndarray) circular buffer of (buys, sells) in the window
+    :param head: (int) next write position in the circular buffer
+    :param count: (int) number of entries held in the buffer
+    :param window: (int) rolling window used for the indicator
+    :param ups: (float) running sum of buy volumes
+    :param downs: (float) running sum of sell volumes
+    :param buys: (float) buy volume for the current step
+    :param sells: (float) sell volume for the current step
+    :return: (ups, downs, head, count)
+    """
+    ups += buys
+    downs += sells
+
+    buf[head, 0] = buys
+    buf[head, 1] = sells
+    head = (head + 1) % window
+    count += 1
+
+    if count >= window:
+        remove = (head - count + window) % window
+        ups -= buf[remove, 0]
+        downs -= buf[remove, 1]
+        count -= 1
+
+    return ups, downs, head, count
+
+
+@njit('f8(f8, f8)', cache=True)
+def tns_value(ups, downs):
+    """
+    Compiled indicator value calculation for TnS
+    :param ups: (float) running sum of buy volumes
+    :param downs: (float) running sum of sell volumes
+    :return: (float) TnS value
+    """
+    nom = round(ups - downs, 6)
+    denom = round(ups + downs, 6)
+
+    if denom == 0.:
+        return 0.
+    else:
+        return nom / denom
+
+
+try:
+    # prefer the ahead-of-time compiled kernel when it has been built
+    #   (see _mm_broker_aot); the native module loads like any other
+    #   extension, with no JIT cache to deserialize at import time
+    from gym_trading.utils._mm_broker_native import step_order
+except ImportError:
+    @njit('Tuple((f8, f8, b1))(b1, f8, f8, f8, f8, f8, f8, f8, f8)',
+          cache=True)
+    def step_order(is_long, price, queue_ahead, executed, bid_price,
+                   ask_price, buy_volume, sell_volume, size):
+        """
+        Compiled per-tick update of an open order's queue position and
+        executed volume against the current market state
+        :param is_long: (bool) True for a long order, False for a short
+        :param price: (float) the order's limit price
+        :param queue_ahead: (float) notional volume queued ahead of the order
+        :param executed: (float) volume executed against the order so far
+        :param bid_price: (float) current best bid price
+        :param ask_price: (float) current best ask price
+        :param buy_volume: (float) buy volume traded this step
+        :param sell_volume: (float) sell volume traded this step
+        :param size: (float) the order's full size
+        :return: (queue_ahead, executed, filled)
+        """
+        # select the side's price and volume once; a sign factor folds the
+        #   two mirror-image trigger comparisons into one:
+        #   long: bid <= price, short: ask >= price
+        cmp_price = bid_price if is_long else ask_price
+        volume = buy_volume if is_long else sell_volume
+        sign = 1. if is_long else -1.
+
+        if sign * (price - cmp_price) >= 0.:
+            if queue_ahead <= 0.:  # first in queue
+                executed += volume
+            else:
+                queue_ahead -= volume
+                if queue_ahead < 0.:
+                    executed -= queue_ahead  # the splash through the queue
+                    queue_ahead = 0.
+
+        filled = executed >= size
+        if filled:
+            executed = size  # trim the overflow beyond the order size
+
+        return queue_ahead, executed, filled
+
+
+def tns_warmup(window):
+    """
+    Build a TnS batch-warmup kernel specialized for a fixed window.
+
+    The window is captured as a closure variable, which Numba freezes
+    into the compiled code as a literal constant, so the modulo and
+    eviction arithmetic specialize per window size. Closure-jitted
+    functions cannot be cached to disk, so each window compiles once
+    per process; kernels are memoized to keep it to exactly once.
+    :param window: (int) rolling window used for the indicator
+    :return: (function) warmup(buf, head, count, ups, downs, buys,
+             sells, values) -> (ups, downs, head, count)
+    """
+    key = ('tns', window)
+    if key in _specialized_warmups:
+        return _specialized_warmups[key]
+
+    @njit
+    def warmup(buf, head, count, ups, downs, buys, sells, values):
+        for i in range(buys.shape[0]):
+            ups += buys[i]
+            downs += sells[i]
+
+            buf[head, 0] = buys[i]
+            buf[head, 1] = sells[i]
+            head = (head + 1) % window
+            count += 1
+
+            if count >= window:
+                remove = (head - count + window) % window
+                ups -= buf[remove, 0]
+                downs -= buf[remove, 1]
+                count -= 1
+
+            values[i] = tns_value(ups, downs)
+        return ups, downs, head, count
+
+    _specialized_warmups[key] = warmup
+    return warmup
+
+
+@njit('Tuple((f8, f8, i8, i8))(f8[:], i8, i8, i8, f8, f8, f8, f8)',
+      cache=True)
+def rsi_step(buf, head, count, window, ups, downs, last_price, price):
+    """
+    Compiled per-tick update for RSI using a circular buffer of
+    price changes; the running sums make each update O(1)
+    :param buf: (ndarray) circular buffer of price changes in the window
+    :param head: (int) next write position in the circular buffer
+    :param count: (int) number of price changes held in the buffer
+    :param window: (int) rolling window used for the indicator
+    :param ups: (float) running sum of positive price changes
+    :param downs: (float) running sum of negative price changes
+    :param last_price: (float) price from the prior step
+    :param price: (float) price for the current step
+    :return: (ups, downs, head, count)
+    """
+    if price == 0.:
+        price_pct_change = 0.
+    elif last_price == 0.:
+        price_pct_change = 0.
+    else:
+        price_pct_change = round((price - last_price) / last_price, 6)
+
+    if np.isinf(price_pct_change):
+        price_pct_change = 0.
+
+    if price_pct_change > 0.:
+        ups += price_pct_change
+    elif price_pct_change < 0.:
+        downs += price_pct_change
+
+    buf[head] = price_pct_change
+    head = (head + 1) % window
+    count += 1
+
+    if count >= window:
+        price_to_remove = buf[(head - count + window) % window]
+        if price_to_remove > 0.:
+            ups -= price_to_remove
+        elif price_to_remove < 0.:
+            downs -= price_to_remove
+        count -= 1
+
+    return ups, downs, head, count
+
+
+@njit('f8(f8, f8)', cache=True)
+def rsi_value(ups, downs):
+    """
+    Compiled indicator value calculation for RSI
+    :param ups: (float) running sum of positive price changes
+    :param downs: (float) running sum of negative price changes
+    :return: (float) RSI value
+    """
+    abs_downs = abs(downs)
+    nom = ups - abs_downs
+    denom = ups + abs_downs
+    if denom == 0.:
+        return 0.
+    elif nom == 0.:
+        return 0.
+    else:
+        return nom / denom
+
+
+def rsi_warmup(window):
+    """
+    Build an RSI batch-warmup kernel specialized for a fixed window.
+
+    The window is captured as a closure variable, which Numba freezes
+    into the compiled code as a literal constant, so the modulo and
+    eviction arithmetic specialize per window size. Closure-jitted
+    functions cannot be cached to disk, so each window compiles once
+    per process; kernels are memoized to keep it to exactly once.
+    :param window: (int) rolling window used for the indicator
+    :return: (function) warmup(buf, head, count, ups, downs, last_price,
+             prices, values) -> (ups, downs, head, count, last_price)
+    """
+    key = ('rsi', window)
+    if key in _specialized_warmups:
+        return _specialized_warmups[key]
+
+    @njit
+    def warmup(buf, head, count, ups, downs, last_price, prices, values):
+        for i in range(prices.shape[0]):
+            price = prices[i]
+            if np.isnan(last_price):
+                last_price = price
+            elif not np.isnan(price):
+                if price == 0.:
+                    price_pct_change = 0.
+                elif last_price == 0.:
+                    price_pct_change = 0.
+                else:
+                    price_pct_change = round(
+                        (price - last_price) / last_price, 6)
+
+                if np.isinf(price_pct_change):
+                    price_pct_change = 0.
+
+                if price_pct_change > 0.:
+                    ups += price_pct_change
+                elif price_pct_change < 0.:
+                    downs += price_pct_change
+
+                buf[head] = price_pct_change
+                head = (head + 1) % window
+                count += 1
+
+                if count >= window:
+                    price_to_remove = buf[(head - count + window) % window]
+                    if price_to_remove > 0.:
+                        ups -= price_to_remove
+                    elif price_to_remove < 0.:
+                        downs -= price_to_remove
+                    count -= 1
+
+                last_price = price
+            values[i] = rsi_value(ups, downs)
+        return ups, downs, head, count, last_price
+
+    _specialized_warmups[key] = warmup
+    return warmup
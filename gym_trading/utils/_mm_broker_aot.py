@@ -0,0 +1,65 @@
+"""
+Ahead-of-time build script for the broker's order matching kernel.
+
+Running this module once per machine
+
+    python -m gym_trading.utils._mm_broker_aot
+
+compiles `step_order` into a native extension module
+(_mm_broker_native.*.so) next to this file. `_jit_kernels` imports the
+native module when it exists and falls back to the cached JIT kernel
+otherwise, so building it is optional; it only removes the residual
+import-time cost of loading the JIT cache in short-lived processes.
+
+The kernel body below must mirror `_jit_kernels.step_order` exactly --
+numba.pycc requires a plain Python function to export, so the logic is
+duplicated here rather than shared with the JIT-decorated dispatcher.
+"""
+import os
+
+from numba.pycc import CC
+
+cc = CC('_mm_broker_native')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+@cc.export('step_order',
+           'Tuple((f8, f8, b1))(b1, f8, f8, f8, f8, f8, f8, f8, f8)')
+def step_order(is_long, price, queue_ahead, executed, bid_price, ask_price,
+               buy_volume, sell_volume, size):
+    """
+    Per-tick update of an open order's queue position and executed
+    volume against the current market state
+    :param is_long: (bool) True for a long order, False for a short
+    :param price: (float) the order's limit price
+    :param queue_ahead: (float) notional volume queued ahead of the order
+    :param executed: (float) volume executed against the order so far
+    :param bid_price: (float) current best bid price
+    :param ask_price: (float) current best ask price
+    :param buy_volume: (float) buy volume traded this step
+    :param sell_volume: (float) sell volume traded this step
+    :param size: (float) the order's full size
+    :return: (queue_ahead, executed, filled)
+    """
+    cmp_price = bid_price if is_long else ask_price
+    volume = buy_volume if is_long else sell_volume
+    sign = 1. if is_long else -1.
+
+    if sign * (price - cmp_price) >= 0.:
+        if queue_ahead <= 0.:  # first in queue
+            executed += volume
+        else:
+            queue_ahead -= volume
+            if queue_ahead < 0.:
+                executed -= queue_ahead  # the splash through the queue
+                queue_ahead = 0.
+
+    filled = executed >= size
+    if filled:
+        executed = size  # trim the overflow beyond the order size
+
+    return queue_ahead, executed, filled
+
+
+if __name__ == '__main__':
+    cc.compile()
@@ -0,0 +1,22 @@
+# jit.py
+#
+#   Optional Numba just-in-time compilation for hot numeric loops.
+#   When numba is not installed, `njit` degrades to a no-op decorator
+#   so every kernel still runs as plain Python.
+#
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """
+        No-op stand-in for numba.njit
+        :param args: (func) when used as a bare decorator
+        :param kwargs: ignored numba options (e.g., cache=True)
+        :return: the decorated function, uncompiled
+        """
+        def decorator(func):
+            return func
+
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return decorator
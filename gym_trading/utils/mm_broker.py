@@ -5,77 +5,94 @@
 #
 import logging
 from configurations.configs import BROKER_FEE
+from gym_trading.utils._jit_kernels import step_order
 import numpy as np
 
 
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
 logger = logging.getLogger('mm_broker')
 
+# integer side ids: comparisons in the step path are single integer
+#   compares, and the ids double as dispatch indices in Broker.add
+SIDE_LONG = 0
+SIDE_SHORT = 1
+_SIDE_NAMES = ('long', 'short')
+_SIDE_IDS = {'long': SIDE_LONG, 'short': SIDE_SHORT}
+
+# hoisted reward scaling: a module-level inverse turns the per-step
+#   reward division into a multiply with no attribute lookup
+_REWARD_SCALE = BROKER_FEE * 2.
+_INV_REWARD_SCALE = 1. / _REWARD_SCALE
+
 
 class Order(object):
+    # fixed attribute slots: smaller per-order footprint and C-level
+    #   attribute access in the step path (class attrs _size/_id stay
+    #   on the class)
+    __slots__ = ('ccy', 'side', 'price', 'step', 'executed', 'id',
+                 'queue_ahead', '_exec_volume', '_exec_notional',
+                 'average_exectution_price', '_queue_feature',
+                 '_queue_feature_dirty')
+
     _size = 1000.
     _id = 0
 
-    def __init__(self, ccy='BTC-USD', side='long', price=0.0, step=-1,
+    def __init__(self, ccy='BTC-USD', side=SIDE_LONG, price=0.0, step=-1,
                  queue_ahead=100.):
         self.ccy = ccy
-        self.side = side
+        # accept 'long'/'short' for backwards compatibility
+        self.side = _SIDE_IDS.get(side, side)
+        self.reset(price=price, step=step, queue_ahead=queue_ahead)
+
+    def reset(self, price=0.0, step=-1, queue_ahead=100.):
+        """
+        Re-arm this instance as a fresh order with a new id, so pooled
+        orders can be reused instead of allocating a new Order per
+        action
+        :param price: (float) the order's limit price
+        :param step: (int) step number the order was placed on
+        :param queue_ahead: (float) notional volume queued ahead
+        :return: (void)
+        """
         self.price = price
         self.step = step
         self.executed = 0.
         Order._id += 1
         self.id = Order._id
         self.queue_ahead = queue_ahead
-        self.executions = dict()
+        # all fills happen at self.price, so a volume and notional
+        #   accumulator replace a per-price dict of executions
+        self._exec_volume = 0.
+        self._exec_notional = 0.
         self.average_exectution_price = -1.
+        # queue-position feature cached until the queue or executed
+        #   volume changes
+        self._queue_feature = 0.
+        self._queue_feature_dirty = True
 
     def __str__(self):
-        return ' %s-%s | %.3f | %i | %.2f | %.2f' % \
-               (self.ccy, self.side, self.price, self.step, self.executed,
-                self.queue_ahead)
-
-    def reduce_queue_ahead(self, executed_volume=100.):
-        self.queue_ahead -= executed_volume
-        if self.queue_ahead < 0.:
-            splash = 0. - self.queue_ahead
-            self.queue_ahead = 0.
-            self.process_executions(volume=splash)
-
-    def process_executions(self, volume=100.):
-        self.executed += volume
-        overflow = 0.
-        if self.is_filled:
-            overflow = self.executed - Order._size
-            # print('executed before = {}'.format(self.executed))
-            self.executed -= overflow
-            # print('executed after = {}'.format(self.executed))
-        _price = float(self.price)
-        if _price in self.executions:
-            self.executions[_price] += volume - overflow
-        else:
-            self.executions[_price] = volume - overflow
+        return (f' {self.ccy}-{_SIDE_NAMES[self.side]} | {self.price:.3f}'
+                f' | {self.step} | {self.executed:.2f}'
+                f' | {self.queue_ahead:.2f}')
 
     def get_average_execution_price(self):
-        total_volume = 0.
-        for k, v in self.executions.items():
-            total_volume += v / k
-        # print('acquired {} position size of {}'.format(self.side, total_volume))
-        self.average_exectution_price = 0.
-        for k, v in self.executions.items():
-            self.average_exectution_price += k * ((v / k) / total_volume)
-        self.average_exectution_price = round(self.average_exectution_price, 4)
-        # print('{} avg_price is {} | {}'.format(self.side,
-        #                                        self.average_exectution_price,
-        #                                        self.price))
+        self.average_exectution_price = round(
+            self._exec_notional / self._exec_volume, 4)
         return self.average_exectution_price
 
-    @property
-    def is_filled(self):
-        return self.executed >= Order._size
-
-    @property
-    def is_first_in_queue(self):
-        return self.queue_ahead <= 0.
+    def queue_feature(self):
+        """
+        Queue-position feature for the observation space, recomputed
+        only when the queue or executed volume changed since the last
+        read
+        :return: (float) queue feature
+        """
+        if self._queue_feature_dirty:
+            executed = self.executed if self.executed > 0.0001 else 0.0001
+            self._queue_feature = (executed - self.queue_ahead) / \
+                (self.queue_ahead + Order._size)
+            self._queue_feature_dirty = False
+        return self._queue_feature
 
 
 class PositionI(object):
@@ -83,22 +100,54 @@ class PositionI(object):
     Position class keeps track the agent's trades
     and provides stats (e.g., pnl)
     """
+    __slots__ = ('max_position_count', '_capacity', '_pos_avg_px',
+                 '_pos_price', '_pos_id', '_head', '_tail', '_count',
+                 'order', 'realized_pnl', 'unrealized_pnl',
+                 'full_inventory', 'total_exposure', 'side',
+                 '_side_sign', 'average_price', '_inv_count',
+                 'reward_size', 'total_trade_count', '_order_slot')
+
     # TODO Add net position to calculate pnl
-    def __init__(self, side='long', max_position=1):
+    def __init__(self, side=SIDE_LONG, max_position=1):
         self.max_position_count = max_position
-        self.positions = []
+        # SoA ring buffer of held positions; only each position's
+        #   average execution price, entry price and id are ever read,
+        #   so three parallel arrays replace a list of Order objects.
+        #   The head/tail indices make FIFO closes in remove_position
+        #   and LIFO pops O(1), with no list shifting
+        #   (one spare slot keeps the ring arithmetic simple)
+        self._capacity = max_position + 1
+        self._pos_avg_px = np.empty(self._capacity, dtype=np.float64)
+        self._pos_price = np.empty(self._capacity, dtype=np.float64)
+        self._pos_id = np.empty(self._capacity, dtype=np.int64)
+        self._head = 0
+        self._tail = 0
+        self._count = 0
         self.order = None
         self.realized_pnl = 0.0
         self.unrealized_pnl = 0.0
         self.full_inventory = False
         self.total_exposure = 0.0
-        self.side = side
+        self.side = _SIDE_IDS.get(side, side)
+        # pooled Order instance backing the open-order slot; add_order
+        #   copies into it, so one allocation serves the whole episode
+        self._order_slot = Order(side=self.side)
+        # +1 for long, -1 for short, so pnl math can flip sign with a
+        #   multiply instead of branching on the side per call
+        self._side_sign = 1.0 if self.side == SIDE_LONG else -1.0
         self.average_price = 0.0
+        # reciprocals of 1..max_position, so maintaining the average
+        #   price costs a multiply instead of a division per fill/close
+        #   (index 0 is a guard and is never read)
+        self._inv_count = np.concatenate(
+            ([0.0], 1.0 / np.arange(1, max_position + 1)))
         self.reward_size = 1 / self.max_position_count
         self.total_trade_count = 0
 
     def reset(self):
-        self.positions.clear()
+        self._head = 0
+        self._tail = 0
+        self._count = 0
         self.order = None
         self.realized_pnl = 0.0
         self.unrealized_pnl = 0.0
@@ -109,150 +158,174 @@ class PositionI(object):
 
     @property
     def position_count(self):
-        return len(self.positions)
+        return self._count
 
     def add_order(self, order):
         if not self.full_inventory:
             if self.order is None:
-                logger.debug('Opened new order={}'.format(order))
-                self.order = order
+                # re-arm the pooled instance rather than retaining the
+                #   caller's object, so callers are free to reuse their
+                #   own Order instances across actions
+                slot = self._order_slot
+                slot.ccy = order.ccy
+                slot.reset(price=order.price, step=order.step,
+                           queue_ahead=order.queue_ahead)
+                self.order = slot
+                logger.debug('Opened new order=%s', slot)
             else:
-                logger.debug('Updating existing order{} '
-                             '--> {}'.format(self.order, order))
-                self.order.price = np.copy(order.price)
-                self.order.queue_ahead = np.copy(order.queue_ahead)
-                self.order.id = np.copy(order.id)
+                logger.debug('Updating existing order%s --> %s',
+                             self.order, order)
+                # plain scalars; np.copy here built 0-d arrays that
+                #   slowed every later comparison in step()
+                self.order.price = float(order.price)
+                self.order.queue_ahead = float(order.queue_ahead)
+                self.order.id = int(order.id)
+                self.order._queue_feature_dirty = True
 
             return True
         else:
-            logger.debug("{} order rejected. "
-                         "Already at max position "
-                         "limit ({})".format(self.side, self.max_position_count))
+            logger.debug('%s order rejected. Already at max position '
+                         'limit (%i)', _SIDE_NAMES[self.side],
+                         self.max_position_count)
             return False
 
     def cancel_order(self):
         if self.order is None:
-            logger.debug('No {} open orders to cancel.'.format(self.side))
+            logger.debug('No %s open orders to cancel.',
+                         _SIDE_NAMES[self.side])
             return False
-        logger.debug('Cancelling order ({})'.format(self.order))
+        logger.debug('Cancelling order (%s)', self.order)
         self.order = None
         return True
 
     def step(self, bid_price=100., ask_price=100., buy_volume=1000.,
              sell_volume=1000., step=100):
-        if self.order is None:
+        order = self.order
+        if order is None:
             return False
 
-        if self.order.side == 'long':
-            if bid_price <= self.order.price:
-                if self.order.is_first_in_queue:
-                    self.order.process_executions(buy_volume)
-                else:
-                    self.order.reduce_queue_ahead(buy_volume)
-
-        elif self.order.side == 'short':
-            if ask_price >= self.order.price:
-                if self.order.is_first_in_queue:
-                    self.order.process_executions(sell_volume)
-                else:
-                    self.order.reduce_queue_ahead(sell_volume)
-
-        if self.order.is_filled:
-            self.positions.append(self.order)
-            self.total_exposure += self.order.get_average_execution_price()
-            self.average_price = self.total_exposure / self.position_count
+        executed = order.executed
+        queue_ahead = order.queue_ahead
+        order.queue_ahead, order.executed, filled = step_order(
+            order.side == SIDE_LONG, order.price, queue_ahead, executed,
+            bid_price, ask_price, buy_volume, sell_volume, Order._size)
+        delta = order.executed - executed
+        if delta > 0.:
+            order._exec_volume += delta
+            order._exec_notional += delta * order.price
+            order._queue_feature_dirty = True
+        elif order.queue_ahead != queue_ahead:
+            order._queue_feature_dirty = True
+
+        if filled:
+            avg_px = order.get_average_execution_price()
+            self._pos_avg_px[self._tail] = avg_px
+            self._pos_price[self._tail] = order.price
+            self._pos_id[self._tail] = order.id
+            self._tail = (self._tail + 1) % self._capacity
+            self._count += 1
+            self.total_exposure += avg_px
+            # Welford-style update: nudge the average toward the new
+            #   fill instead of recomputing exposure / count
+            self.average_price += (avg_px - self.average_price) * \
+                self._inv_count[self._count]
             self.full_inventory = self.position_count >= self.max_position_count
-            steps_to_fill = step - self.order.step
-            logger.debug('FILLED %s order #%i at %.3f after %i steps on %i.' %
-                         (self.order.side, self.order.id, self.order.price,
-                          steps_to_fill, step))
+            steps_to_fill = step - order.step
+            logger.debug('FILLED %s order #%i at %.3f after %i steps on %i.',
+                         _SIDE_NAMES[order.side], order.id, order.price,
+                         steps_to_fill, step)
             self.order = None  # set the slot back to no open orders
             return True
 
         return False
 
     def pop_position(self):
-        if self.position_count > 0:
-            position = self.positions.pop()
+        if self._count > 0:
+            self._tail = (self._tail - 1) % self._capacity
+            self._count -= 1
+            price = float(self._pos_price[self._tail])
 
             # update positions attributes
-            self.total_exposure -= position.average_exectution_price
-            if self.position_count > 0:
-                self.average_price = self.total_exposure / self.position_count
-            else:
-                self.average_price = 0
-
-            self.full_inventory = self.position_count >= self.max_position_count
-            logger.debug('---%s position #%i @ %.4f has been netted out.' % (
-                self.side, position.id, position.price))
-            return position
+            removed_avg_px = self._pos_avg_px[self._tail]
+            self.total_exposure -= removed_avg_px
+            # _inv_count[0] is 0., which zeroes the average price when
+            #   the last position is removed
+            self.average_price = (self.average_price * (self._count + 1) -
+                                  removed_avg_px) * \
+                self._inv_count[self._count]
+
+            self.full_inventory = self._count >= self.max_position_count
+            logger.debug('---%s position #%i @ %.4f has been netted out.',
+                         _SIDE_NAMES[self.side], self._pos_id[self._tail],
+                         price)
+            return price
         else:
-            logger.info('Error. No {} pop_position to remove.'.format(self.side))
+            logger.info('Error. No %s pop_position to remove.',
+                        _SIDE_NAMES[self.side])
             return None
 
     def remove_position(self, midpoint=100.):
         pnl = 0.
-        if self.position_count > 0:
-            order = self.positions.pop(0)
+        if self._count > 0:
+            head = self._head
+            price = float(self._pos_price[head])
+            self._head = (head + 1) % self._capacity
+            self._count -= 1
             # Calculate PnL
-            if self.side == 'long':
-                pnl = (midpoint - order.price) / order.price
-            elif self.side == 'short':
-                pnl = (order.price - midpoint) / order.price
+            pnl = self._side_sign * (midpoint - price) / price
             # Add Profit and Loss to total
             self.realized_pnl += pnl
             # update positions attributes
-            self.total_exposure -= order.average_exectution_price
-            if self.position_count > 0:
-                self.average_price = self.total_exposure / self.position_count
-            else:
-                self.average_price = 0
-            self.full_inventory = self.position_count >= self.max_position_count
+            removed_avg_px = self._pos_avg_px[head]
+            self.total_exposure -= removed_avg_px
+            self.average_price = (self.average_price * (self._count + 1) -
+                                  removed_avg_px) * \
+                self._inv_count[self._count]
+            self.full_inventory = self._count >= self.max_position_count
             self.total_trade_count += 1  # entry and exit = two trades
-            logger.debug('Closing %s position #%i. PnL=%.4f\n' %
-                        (self.side, order.id, pnl))
+            logger.debug('Closing %s position #%i. PnL=%.4f\n',
+                         _SIDE_NAMES[self.side], self._pos_id[head], pnl)
             return pnl
         else:
-            logger.info('Error. No {} positions to remove.'.format(self.side))
+            logger.info('Error. No %s positions to remove.',
+                        _SIDE_NAMES[self.side])
             return pnl
 
     def flatten_inventory(self, midpoint=100.):
-        logger.debug('{} is flattening inventory of {}'.format(self.side,
-                                                               self.position_count))
-        prev_realized_pnl = self.realized_pnl
-        if self.position_count < 1:
+        logger.debug('%s is flattening inventory of %i',
+                     _SIDE_NAMES[self.side], self._count)
+        count = self._count
+        if count < 1:
             return -0.00000000001
 
-        while self.position_count > 0:
-            self.remove_position(midpoint=midpoint)
-            self.realized_pnl -= BROKER_FEE  # marker order fee
+        # close every held position in one vectorized pass over the
+        #   ring buffer instead of popping them one at a time
+        prices = self._pos_price[(self._head + np.arange(count)) %
+                                 self._capacity]
+        pnls = self._side_sign * (midpoint - prices) / prices
+        delta = float(pnls.sum()) - count * BROKER_FEE  # marker order fee
+        self.realized_pnl += delta
+        self.total_trade_count += count  # entry and exit = two trades
+        self._head = 0
+        self._tail = 0
+        self._count = 0
+        self.total_exposure = 0.0
+        self.average_price = 0.0
+        self.full_inventory = False
 
-        return self.realized_pnl - prev_realized_pnl  # net change in PnL
+        return delta  # net change in PnL
 
     def get_unrealized_pnl(self, midpoint=100.):
-        if self.position_count == 0:
+        if self._count == 0 or self.average_price == 0.0:
             return 0.0
-
-        difference = 0.0
-        if self.side == 'long':
-            difference = midpoint - self.average_price
-        elif self.side == 'short':
-            difference = self.average_price - midpoint
-
-        if difference == 0.0:
-            unrealized_pnl = 0.0
-        else:
-            unrealized_pnl = difference / self.average_price
-
-        return unrealized_pnl
+        return self._side_sign * (midpoint - self.average_price) / \
+            self.average_price
 
     def get_distance_to_midpoint(self, midpoint=100.):
         if self.order is None:
             return 0.
-        if self.side == 'long':
-            return (midpoint - self.order.price) / self.order.price
-        elif self.side == 'short':
-            return (self.order.price - midpoint) / self.order.price
+        return self._side_sign * (midpoint - self.order.price) / \
+            self.order.price
 
 
 class Broker(object):
@@ -260,25 +333,21 @@ class Broker(object):
     Broker class is a wrapper for the PositionI class
     and is implemented in `gym_trading.py`
     '''
-    reward_scale = BROKER_FEE * 2.
+    reward_scale = _REWARD_SCALE
 
     def __init__(self, max_position=1):
-        self.long_inventory = PositionI(side='long', max_position=max_position)
-        self.short_inventory = PositionI(side='short', max_position=max_position)
+        self.long_inventory = PositionI(side=SIDE_LONG,
+                                        max_position=max_position)
+        self.short_inventory = PositionI(side=SIDE_SHORT,
+                                         max_position=max_position)
+        self._inventories = (self.long_inventory, self.short_inventory)
 
     def reset(self):
         self.long_inventory.reset()
         self.short_inventory.reset()
 
     def add(self, order):
-        if order.side == 'long':
-            return self.long_inventory.add_order(order=order)
-        elif order.side == 'short':
-            return self.short_inventory.add_order(order=order)
-        else:
-            logger.warning('Error. Broker trying to add to '
-                           'the wrong side [{}]'.format(order.side))
-            return False
+        return self._inventories[order.side].add_order(order=order)
 
     def get_unrealized_pnl(self, midpoint=100.):
         long_pnl = self.long_inventory.get_unrealized_pnl(midpoint=midpoint)
@@ -293,6 +362,26 @@ class Broker(object):
                     self.get_realized_pnl()
         return total_pnl
 
+    def snapshot(self, midpoint=100.):
+        """
+        Render the broker state consumed by position features in one pass,
+        reusing the unrealized PnL for the total PnL instead of
+        recomputing it
+        :param midpoint: (float) current midpoint price
+        :return: (tuple) long count, short count, total pnl,
+                long/short unrealized pnl, long/short order distances
+        """
+        long_upnl = self.long_inventory.get_unrealized_pnl(midpoint=midpoint)
+        short_upnl = self.short_inventory.get_unrealized_pnl(midpoint=midpoint)
+        total_pnl = long_upnl + short_upnl + self.get_realized_pnl()
+        return (self.long_inventory.position_count,
+                self.short_inventory.position_count,
+                total_pnl,
+                long_upnl,
+                short_upnl,
+                self.get_long_order_distance_to_midpoint(midpoint=midpoint),
+                self.get_short_order_distance_to_midpoint(midpoint=midpoint))
+
     @property
     def long_inventory_count(self):
         return self.long_inventory.position_count
@@ -305,11 +394,17 @@ class Broker(object):
         total_pnl = self.long_inventory.flatten_inventory(midpoint=bid_price)
         total_pnl += self.short_inventory.flatten_inventory(midpoint=ask_price)
         if total_pnl != 0.:
-            total_pnl /= Broker.reward_scale
+            total_pnl *= _INV_REWARD_SCALE
         return total_pnl
 
     def step(self,  bid_price=100., ask_price=100., buy_volume=1000.,
              sell_volume=1000., step=100):
+        # fast path: nothing can fill when neither side has an open
+        #   order, which is the common case between order placements
+        if self.long_inventory.order is None and \
+                self.short_inventory.order is None:
+            return 0.
+
         pnl = 0.
 
         if self.long_inventory.step(bid_price=bid_price, ask_price=ask_price,
@@ -318,9 +413,9 @@ class Broker(object):
             # check if we can net the inventory
             if self.short_inventory_count > 0:
                 # net out the inventory
-                new_position = self.long_inventory.pop_position()
+                entry_price = self.long_inventory.pop_position()
                 pnl += self.short_inventory.remove_position(
-                    midpoint=new_position.price)
+                    midpoint=entry_price)
                 # if pnl != 0.:
                 #     pnl /= Broker.reward_scale
 
@@ -330,38 +425,27 @@ class Broker(object):
             # check if we can net the inventory
             if self.long_inventory_count > 0:
                 # net out the inventory
-                new_position = self.short_inventory.pop_position()
+                entry_price = self.short_inventory.pop_position()
                 pnl += self.long_inventory.remove_position(
-                    midpoint=new_position.price)
+                    midpoint=entry_price)
                 # if pnl != 0.:
                 #     pnl /= Broker.reward_scale
 
-        return pnl / Broker.reward_scale
+        return pnl * _INV_REWARD_SCALE
 
     def get_short_order_distance_to_midpoint(self, midpoint=100.):
-        return self.short_inventory.get_distance_to_midpoint(midpoint=midpoint) / \
-               Broker.reward_scale
+        return self.short_inventory.get_distance_to_midpoint(
+            midpoint=midpoint) * _INV_REWARD_SCALE
 
     def get_long_order_distance_to_midpoint(self, midpoint=100.):
-        return self.long_inventory.get_distance_to_midpoint(midpoint=midpoint) / \
-               Broker.reward_scale
+        return self.long_inventory.get_distance_to_midpoint(
+            midpoint=midpoint) * _INV_REWARD_SCALE
 
     def get_queues_ahead_features(self):
-        buy_queue = short_queue = 0.
-
-        if self.long_inventory.order:
-            queue = self.long_inventory.order.queue_ahead
-            executions = max(self.long_inventory.order.executed, 0.0001)
-            trade_size = self.long_inventory.order._size
-            buy_queue = (executions - queue) / (queue + trade_size)
-
-        if self.short_inventory.order:
-            queue = self.short_inventory.order.queue_ahead
-            executions = max(self.short_inventory.order.executed, 0.0001)
-            trade_size = self.short_inventory.order._size
-            short_queue = (executions - queue) / (queue + trade_size)
-
-        return buy_queue, short_queue
+        long_order = self.long_inventory.order
+        short_order = self.short_inventory.order
+        return (0. if long_order is None else long_order.queue_feature(),
+                0. if short_order is None else short_order.queue_feature())
 
     def get_total_trade_count(self):
         return self.long_inventory.total_trade_count + \